@@ -3,7 +3,7 @@ import logging
 from pathlib import Path
 from src.agents.navigator import NavigatorAgent
 from src.agents.chart_analyzer import ChartAnalyzerAgent
-from src.utils.browser import BrowserManager
+from src.utils.browser_pool import ShardedBrowserManager
 from src.config import Config
 
 def setup_logging():
@@ -24,7 +24,7 @@ async def main():
     
     try:
         # Initialize components
-        browser_manager = BrowserManager()
+        browser_manager = ShardedBrowserManager()
         await browser_manager.initialize()
         
         # Create analysis queue
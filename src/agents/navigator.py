@@ -19,26 +19,13 @@ class NavigatorAgent(Agent):
     async def run(self, token_address: str):
         """Navigate and capture token data from pump.fun"""
         self.logger.info(f"Starting navigation for token: {token_address}")
-        page = await self.browser_manager.new_page()
-        
         try:
-            # Build and navigate to URL
+            # Build URL and hand navigation + capture to the browser layer
             token_url = f"{self.base_url}/token/{token_address}"
             self.logger.info(f"Navigating to: {token_url}")
             
-            # Navigate with longer timeout
-            await page.goto(token_url, timeout=30000)
-            self.logger.info("Page loaded successfully")
-            
-            # Wait for chart with explicit logging
-            self.logger.info("Waiting for chart container...")
-            await page.wait_for_selector('.chart-container', timeout=10000)
-            self.logger.info("Chart container found")
-            
-            # Take screenshot
-            self.logger.info("Capturing screenshot...")
-            screenshot = await self.browser_manager.capture_screenshot(
-                page=page,
+            screenshot = await self.browser_manager.navigate_and_capture(
+                url=token_url,
                 token_address=token_address,
                 element_selector='.chart-container'
             )
@@ -60,5 +47,3 @@ class NavigatorAgent(Agent):
         except Exception as e:
             self.logger.error(f"Navigation failed: {str(e)}")
             return None
-        finally:
-            await page.close()
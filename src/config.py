@@ -16,6 +16,16 @@ class Config:
     VIEWPORT_SIZE = {"width": 1920, "height": 1080}
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     
+    # Browser Sharding
+    BROWSER_SHARDS = int(os.getenv('BROWSER_SHARDS', os.cpu_count() or 1))
+    BROWSER_SHARD_PROCESSES = os.getenv('BROWSER_SHARD_PROCESSES', 'False').lower() == 'true'
+    CONTEXTS_PER_SHARD = int(os.getenv('CONTEXTS_PER_SHARD', 1))
+    SHARD_MAX_MEMORY_MB = int(os.getenv('SHARD_MAX_MEMORY_MB', 1536))
+    SHARD_MAX_NAVIGATIONS = int(os.getenv('SHARD_MAX_NAVIGATIONS', 500))
+    SHARD_HEALTH_INTERVAL = 15  # seconds
+    SHARD_START_TIMEOUT = 60  # seconds
+    SHARD_PROBE_TIMEOUT = 5  # seconds
+    
     # Paths
     BASE_DIR = Path(__file__).parent.parent
     SCREENSHOT_DIR = BASE_DIR / "analysis_screenshots"
@@ -24,3 +34,7 @@ class Config:
     # Timeouts
     PAGE_LOAD_TIMEOUT = 30000  # milliseconds
     SCREENSHOT_TIMEOUT = 10000  # milliseconds
+    
+    # Longest navigate_and_capture can run (goto, selector wait, capture
+    # selector wait, screenshot) plus slack for opening and closing the page
+    SHARD_DRAIN_TIMEOUT = (PAGE_LOAD_TIMEOUT + 3 * SCREENSHOT_TIMEOUT) / 1000 + 30  # seconds
@@ -0,0 +1,443 @@
+import asyncio
+import logging
+import os
+import time
+import pytest
+from .utils.browser_pool import BrowserShard, ProcessShard, ShardedBrowserManager
+
+class FakeShard:
+    """Stands in for a browser shard without launching Chromium"""
+
+    def __init__(self, shard_id, start_ok=True):
+        self.shard_id = shard_id
+        self.start_ok = start_ok
+        self.crashed = False
+        self.crash_on_navigate = False
+        self.error = None
+        self.result = "screenshot"
+        self.memory_mb = 100
+        self.hang_health = False
+        self.gate = None
+        self.start_gate = None
+        self.calls = 0
+        self.closed = False
+
+    async def initialize(self):
+        if self.start_gate:
+            await self.start_gate.wait()
+        return self.start_ok
+
+    async def navigate_and_capture(self, url, token_address, element_selector=None):
+        self.calls += 1
+        if self.gate:
+            await self.gate.wait()
+        if self.crash_on_navigate:
+            self.crashed = True
+            raise RuntimeError("browser crashed")
+        if self.error:
+            raise RuntimeError(self.error)
+        return self.result
+
+    async def health(self):
+        if self.hang_health:
+            await asyncio.Event().wait()
+        return {"connected": not self.crashed, "memory_mb": self.memory_mb}
+
+    async def close(self):
+        self.closed = True
+
+
+class WorkerFakeShard:
+    """Runs inside a ProcessShard worker in place of a BrowserShard
+
+    The url picks the behaviour: "sleep:<seconds>", "crash:<shard_id>",
+    "log:<message>", "exit" or "hang". Negative shard ids fail to start.
+    """
+
+    def __init__(self, shard_id, headless=True, proxy=None, contexts=1):
+        self.shard_id = shard_id
+        self.crashed = False
+
+    async def initialize(self):
+        return self.shard_id >= 0
+
+    async def navigate_and_capture(self, url, token_address, element_selector=None):
+        action, _, arg = url.partition(":")
+        if action == "sleep":
+            await asyncio.sleep(float(arg))
+        elif action == "crash" and int(arg) == self.shard_id:
+            self.crashed = True
+            raise RuntimeError("browser crashed")
+        elif action == "log":
+            logging.getLogger("worker_fake").info(arg)
+        elif action == "exit":
+            os._exit(1)
+        elif action == "hang":
+            # Blocks the worker's event loop, so not even close() gets through
+            time.sleep(3600)
+        return token_address
+
+    async def health(self):
+        return {"connected": not self.crashed, "memory_mb": 1.0}
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, name):
+        self.name = name
+
+    async def new_page(self):
+        return self.name
+
+
+async def make_manager(shards=2, start_ok=None, start_gate=None):
+    """Build an initialized manager whose shards are FakeShards
+
+    start_gate, if given, holds up restarts of shard 0.
+    """
+    manager = ShardedBrowserManager(shards=shards)
+    created = []
+    start_ok = list(start_ok or [])
+
+    def create_shard(shard_id):
+        shard = FakeShard(shard_id, start_ok=start_ok.pop(0) if start_ok else True)
+        if len(created) >= shards and shard_id == 0:
+            shard.start_gate = start_gate
+        created.append(shard)
+        return shard
+
+    manager._create_shard = create_shard
+    assert await manager.initialize()
+    return manager, created
+
+@pytest.mark.asyncio
+async def test_dispatches_to_least_loaded_shard():
+    manager, shards = await make_manager(shards=3)
+    gate = asyncio.Event()
+    for shard in shards:
+        shard.gate = gate
+
+    try:
+        tasks = [asyncio.create_task(manager.navigate_and_capture("url", "token")) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert [shard.calls for shard in shards] == [1, 1, 1]
+
+        gate.set()
+        assert await asyncio.gather(*tasks) == ["screenshot"] * 3
+        assert [stat["active"] for stat in manager.shard_stats()] == [0, 0, 0]
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_retries_on_another_shard_after_crash():
+    manager, shards = await make_manager(shards=2)
+    shards[0].crash_on_navigate = True
+
+    try:
+        assert await manager.navigate_and_capture("url", "token") == "screenshot"
+        stats = manager.shard_stats()
+        assert stats[0]["failed"] == 1
+        assert stats[0]["status"] == "crashed"
+        assert stats[1]["completed"] == 1
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_retries_when_slot_restarted_under_call():
+    manager, shards = await make_manager(shards=2)
+    shards[0].gate = asyncio.Event()
+    slot = manager.slots[0]
+
+    try:
+        task = asyncio.create_task(manager.navigate_and_capture("url", "token"))
+        await asyncio.sleep(0)
+
+        # Restarted shards are not flagged as crashed, only replaced
+        await manager._restart(slot)
+        shards[0].error = "Target closed"
+        shards[0].gate.set()
+
+        assert await task == "screenshot"
+        assert shards[1].calls + shards[2].calls == 1
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_none_result_counts_as_failed():
+    manager, shards = await make_manager(shards=1)
+    shards[0].result = None
+
+    try:
+        assert await manager.navigate_and_capture("url", "token") is None
+        stats = manager.shard_stats()[0]
+        assert stats["completed"] == 0
+        assert stats["failed"] == 1
+        assert stats["per_minute"] == 0
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_drains_and_restarts_after_max_navigations():
+    manager, shards = await make_manager(shards=1)
+    manager.config.SHARD_MAX_NAVIGATIONS = 2
+    slot = manager.slots[0]
+
+    try:
+        await manager.navigate_and_capture("url", "token")
+        await manager.navigate_and_capture("url", "token")
+        assert slot.status == "draining"
+        with pytest.raises(RuntimeError):
+            await manager.navigate_and_capture("url", "token")
+
+        await manager._check_slot(slot)
+        assert shards[0].closed
+        assert slot.shard is shards[1]
+        assert manager.shard_stats()[0]["restarts"] == 1
+        assert await manager.navigate_and_capture("url", "token") == "screenshot"
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_memory_bloat_waits_for_in_flight_work():
+    manager, shards = await make_manager(shards=1)
+    manager.config.SHARD_MAX_MEMORY_MB = 500
+    shards[0].memory_mb = 800
+    shards[0].gate = asyncio.Event()
+    slot = manager.slots[0]
+
+    try:
+        task = asyncio.create_task(manager.navigate_and_capture("url", "token"))
+        await asyncio.sleep(0)
+
+        await manager._check_slot(slot)
+        assert slot.status == "draining"
+        assert slot.shard is shards[0]
+
+        shards[0].gate.set()
+        assert await task == "screenshot"
+        await manager._check_slot(slot)
+        assert slot.shard is shards[1]
+        assert slot.status == "healthy"
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_wedged_shard_is_restarted_after_drain_timeout():
+    manager, shards = await make_manager(shards=2)
+    manager.config.SHARD_PROBE_TIMEOUT = 0.01
+    shards[0].hang_health = True
+    shards[0].gate = asyncio.Event()
+    slot = manager.slots[0]
+
+    try:
+        stuck = asyncio.create_task(manager.navigate_and_capture("url", "token"))
+        await asyncio.sleep(0)
+
+        await manager._check_slot(slot)
+        assert slot.status == "draining"
+        assert await manager.navigate_and_capture("url", "token") == "screenshot"
+        assert shards[1].calls == 1
+
+        manager.config.SHARD_DRAIN_TIMEOUT = -1
+        await manager._check_slot(slot)
+        assert shards[0].closed
+        assert slot.shard is shards[2]
+        stuck.cancel()
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_failed_restart_is_retried():
+    manager, shards = await make_manager(shards=1, start_ok=[True, False, True])
+    slot = manager.slots[0]
+    shards[0].crashed = True
+
+    try:
+        await manager._check_slot(slot)
+        assert slot.shard is shards[1]
+        assert slot.status == "crashed"
+
+        await manager._check_slot(slot)
+        assert slot.shard is shards[2]
+        assert slot.status == "healthy"
+        assert manager.shard_stats()[0]["restarts"] == 2
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_slow_restart_does_not_block_other_checks():
+    start_gate = asyncio.Event()
+    manager, shards = await make_manager(shards=2, start_gate=start_gate)
+    manager.config.SHARD_HEALTH_INTERVAL = 0.01
+    manager.config.SHARD_MAX_MEMORY_MB = 500
+    shards[0].crashed = True
+
+    try:
+        # Shard 0's restart hangs in initialize while shard 1 is still probed
+        shards[1].memory_mb = 800
+        await asyncio.sleep(0.1)
+        assert manager.slots[0].status == "restarting"
+        assert manager.slots[1].shard is shards[3]
+        assert manager.slots[1].status == "healthy"
+
+        start_gate.set()
+        await asyncio.sleep(0.05)
+        assert manager.slots[0].shard is shards[2]
+        assert manager.slots[0].status == "healthy"
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_shard_stats_reports_throughput():
+    manager, shards = await make_manager(shards=2)
+
+    try:
+        for _ in range(4):
+            await manager.navigate_and_capture("url", "token")
+        stats = manager.shard_stats()
+        assert [stat["shard_id"] for stat in stats] == [0, 1]
+        assert sum(stat["completed"] for stat in stats) == 4
+        assert sum(stat["per_minute"] for stat in stats) == 4
+        for stat in stats:
+            assert stat["status"] == "healthy"
+            assert stat["avg_latency"] is not None
+            assert stat["memory_mb"] is None
+    finally:
+        await manager.close()
+
+@pytest.mark.asyncio
+async def test_process_shard_spawn_failure_counts_as_crashed():
+    # Unpicklable worker arguments make Process.start() raise
+    shard = ProcessShard(0, contexts=lambda: None)
+
+    assert not await shard.initialize()
+    assert shard.crashed
+    with pytest.raises(RuntimeError):
+        await shard.navigate_and_capture("url", "token")
+
+@pytest.mark.asyncio
+async def test_browser_shard_spreads_pages_across_contexts():
+    shard = BrowserShard(0, contexts=3)
+    shard.contexts = [FakeContext("a"), FakeContext("b"), FakeContext("c")]
+
+    assert [await shard.new_page() for _ in range(4)] == ["a", "b", "c", "a"]
+
+@pytest.mark.asyncio
+async def test_browser_shard_crash_flag():
+    shard = BrowserShard(0)
+    shard.contexts = [FakeContext("a")]
+
+    shard._on_disconnected(None)
+    assert shard.crashed
+    with pytest.raises(RuntimeError):
+        await shard.new_page()
+
+    # Disconnects caused by close() are not crashes
+    closing = BrowserShard(1)
+    closing._closing = True
+    closing._on_disconnected(None)
+    assert not closing.crashed
+
+async def start_worker(shard_id=0):
+    shard = ProcessShard(shard_id, shard_factory=WorkerFakeShard)
+    shard.close_timeout = 0.5
+    assert await shard.initialize()
+    return shard
+
+@pytest.mark.asyncio
+async def test_worker_runs_calls_concurrently():
+    shard = await start_worker()
+
+    try:
+        started = time.monotonic()
+        results = await asyncio.gather(
+            shard.navigate_and_capture("sleep:0.5", "slow"),
+            shard.navigate_and_capture("sleep:0.1", "fast"),
+            shard.health()
+        )
+        assert results == ["slow", "fast", {"connected": True, "memory_mb": 1.0}]
+        assert time.monotonic() - started < 1.0
+    finally:
+        await shard.close()
+    assert shard.process is None
+
+@pytest.mark.asyncio
+async def test_worker_reports_browser_crash():
+    shard = await start_worker()
+
+    try:
+        with pytest.raises(RuntimeError, match="browser crashed"):
+            await shard.navigate_and_capture("crash:0", "token")
+        assert shard.process.is_alive()
+        assert shard.crashed
+    finally:
+        await shard.close()
+
+@pytest.mark.asyncio
+async def test_worker_killed_mid_call_fails_pending_calls():
+    shard = await start_worker()
+
+    try:
+        pending = asyncio.create_task(shard.navigate_and_capture("sleep:30", "token"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(RuntimeError, match="died"):
+            await shard.navigate_and_capture("exit", "token")
+        with pytest.raises(RuntimeError, match="died"):
+            await pending
+        assert shard.crashed
+    finally:
+        await shard.close()
+
+@pytest.mark.asyncio
+async def test_close_terminates_hung_worker():
+    shard = await start_worker()
+    process = shard.process
+    hung = asyncio.create_task(shard.navigate_and_capture("hang", "token"))
+    await asyncio.sleep(0.1)
+
+    await shard.close()
+    assert not process.is_alive()
+    assert shard.process is None
+    with pytest.raises(RuntimeError):
+        await hung
+
+@pytest.mark.asyncio
+async def test_worker_logs_reach_parent(caplog):
+    caplog.set_level(logging.INFO)
+    shard = await start_worker()
+
+    try:
+        await shard.navigate_and_capture("log:hello from worker", "token")
+        for _ in range(50):
+            if "hello from worker" in caplog.messages:
+                break
+            await asyncio.sleep(0.05)
+        assert "hello from worker" in caplog.messages
+    finally:
+        await shard.close()
+
+@pytest.mark.asyncio
+async def test_worker_failed_start():
+    shard = ProcessShard(-1, shard_factory=WorkerFakeShard)
+
+    try:
+        assert not await shard.initialize()
+    finally:
+        await shard.close()
+
+@pytest.mark.asyncio
+async def test_retries_after_browser_crash_in_worker():
+    manager = ShardedBrowserManager(shards=2, use_processes=True)
+    manager._create_shard = lambda shard_id: ProcessShard(shard_id, shard_factory=WorkerFakeShard)
+    assert await manager.initialize()
+
+    try:
+        assert await manager.navigate_and_capture("crash:0", "token") == "token"
+        stats = manager.shard_stats()
+        assert stats[0]["status"] == "crashed"
+        assert stats[0]["failed"] == 1
+        assert stats[1]["completed"] == 1
+    finally:
+        await manager.close()
@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 
 class BrowserManager:
     def __init__(self, headless=True, proxy=None):
+        self.playwright = None
         self.browser = None
         self.config = Config()
         self.context = None
@@ -18,23 +19,13 @@ class BrowserManager:
     async def initialize(self):
         """Initialize browser instance"""
         try:
-            playwright = await async_playwright().start()
-            self.browser = await playwright.chromium.launch(
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
                 headless=self.headless,
                 args=['--no-sandbox']
             )
             
-            # Create context with existing config
-            context_options = {
-                "viewport": self.config.VIEWPORT_SIZE,
-                "user_agent": self.config.USER_AGENT,
-            }
-            
-            # Add proxy only if provided
-            if self.proxy:
-                context_options["proxy"] = self.proxy
-                
-            self.context = await self.browser.new_context(**context_options)
+            self.context = await self.browser.new_context(**self._context_options())
             logger.info("Browser initialized successfully")
             return True
             
@@ -42,6 +33,18 @@ class BrowserManager:
             logger.error(f"Failed to initialize browser: {str(e)}")
             return False
 
+    def _context_options(self) -> dict:
+        """Build context options from existing config"""
+        context_options = {
+            "viewport": self.config.VIEWPORT_SIZE,
+            "user_agent": self.config.USER_AGENT,
+        }
+        
+        # Add proxy only if provided
+        if self.proxy:
+            context_options["proxy"] = self.proxy
+        return context_options
+
     async def new_page(self) -> Page:
         """Create new page with error handling"""
         if not self.context:
@@ -57,10 +60,10 @@ class BrowserManager:
             Path(screenshot_path.parent).mkdir(parents=True, exist_ok=True)
             
             if element_selector:
-                element = await page.wait_for_selector(element_selector)
-                await element.screenshot(path=screenshot_path)
+                element = await page.wait_for_selector(element_selector, timeout=self.config.SCREENSHOT_TIMEOUT)
+                await element.screenshot(path=screenshot_path, timeout=self.config.SCREENSHOT_TIMEOUT)
             else:
-                await page.screenshot(path=screenshot_path, full_page=True)
+                await page.screenshot(path=screenshot_path, full_page=True, timeout=self.config.SCREENSHOT_TIMEOUT)
 
             # Convert to base64 for storage/transmission
             with open(screenshot_path, "rb") as image_file:
@@ -72,6 +75,30 @@ class BrowserManager:
             logger.error(f"Screenshot capture failed for {token_address}: {str(e)}")
             return None
 
+    async def navigate_and_capture(self, url: str, token_address: str, element_selector: str = None) -> str:
+        """Open a page, navigate to url and capture a screenshot of it"""
+        page = await self.new_page()
+        if page is None:
+            raise RuntimeError("Browser is not available")
+
+        try:
+            await page.goto(url, timeout=self.config.PAGE_LOAD_TIMEOUT)
+            logger.info("Page loaded successfully")
+            
+            if element_selector:
+                logger.info(f"Waiting for {element_selector}...")
+                await page.wait_for_selector(element_selector, timeout=self.config.SCREENSHOT_TIMEOUT)
+                logger.info(f"{element_selector} found")
+            
+            logger.info("Capturing screenshot...")
+            return await self.capture_screenshot(
+                page=page,
+                token_address=token_address,
+                element_selector=element_selector
+            )
+        finally:
+            await page.close()
+
     async def close(self):
         """Clean up browser resources"""
         try:
@@ -80,5 +107,7 @@ class BrowserManager:
             if self.browser:
                 await self.browser.close()
                 logger.info("Browser closed successfully")
+            if self.playwright:
+                await self.playwright.stop()
         except Exception as e:
             logger.error(f"Failed to close browser: {str(e)}")
@@ -0,0 +1,608 @@
+from playwright.async_api import Page
+from .browser import BrowserManager
+from ..config import Config
+from collections import deque
+from logging.handlers import QueueHandler
+import multiprocessing
+import threading
+import logging
+import asyncio
+import time
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Seconds of completions counted towards per-shard throughput
+THROUGHPUT_WINDOW = 60
+
+class BrowserShard(BrowserManager):
+    """Single Chromium instance owning its own set of contexts"""
+
+    def __init__(self, shard_id: int, headless=True, proxy=None, contexts=1):
+        super().__init__(headless=headless, proxy=proxy)
+        self.shard_id = shard_id
+        self.context_count = max(1, contexts)
+        self.contexts = []
+        self.crashed = False
+        self._closing = False
+        self._next_context = 0
+
+    async def initialize(self):
+        """Launch the browser and open the shard's contexts"""
+        if not await super().initialize():
+            return False
+
+        try:
+            self.browser.on("disconnected", self._on_disconnected)
+            self.contexts = [self.context]
+            for _ in range(self.context_count - 1):
+                self.contexts.append(await self.browser.new_context(**self._context_options()))
+            logger.info(f"Browser shard {self.shard_id} started with {len(self.contexts)} context(s)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to open contexts for shard {self.shard_id}: {str(e)}")
+            return False
+
+    def _on_disconnected(self, _browser):
+        if self._closing:
+            return
+        self.crashed = True
+        logger.warning(f"Browser shard {self.shard_id} disconnected")
+
+    async def new_page(self) -> Page:
+        """Create new page, spreading pages across the shard's contexts"""
+        if self.crashed or not self.contexts:
+            raise RuntimeError(f"Browser shard {self.shard_id} is not running")
+        context = self.contexts[self._next_context % len(self.contexts)]
+        self._next_context += 1
+        return await context.new_page()
+
+    async def memory_mb(self) -> float:
+        """Resident memory of all browser processes, or None where unavailable"""
+        try:
+            session = await self.browser.new_browser_cdp_session()
+            try:
+                info = await session.send("SystemInfo.getProcessInfo")
+            finally:
+                await session.detach()
+
+            page_size = os.sysconf("SC_PAGE_SIZE")
+            total = 0
+            for process in info.get("processInfo", []):
+                statm = Path(f"/proc/{process['id']}/statm")
+                if statm.exists():
+                    total += int(statm.read_text().split()[1]) * page_size
+            return total / (1024 * 1024) if total else None
+
+        except Exception as e:
+            logger.debug(f"Memory probe failed for shard {self.shard_id}: {str(e)}")
+            return None
+
+    async def health(self) -> dict:
+        """Report connection state and memory usage"""
+        connected = not self.crashed and self.browser is not None and self.browser.is_connected()
+        return {
+            "connected": connected,
+            "memory_mb": await self.memory_mb() if connected else None
+        }
+
+    async def close(self):
+        """Clean up browser resources"""
+        self._closing = True
+        await super().close()
+
+
+def _worker_main(shard_factory, shard_id, headless, proxy, contexts, conn, log_queue, log_level):
+    """Worker process entry point hosting one shard built by shard_factory"""
+    # Spawned workers start with bare logging, so hand every record to the
+    # parent, which logs it through its own configuration
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(log_level)
+    asyncio.run(_worker_serve(shard_factory, shard_id, headless, proxy, contexts, conn))
+
+async def _worker_serve(shard_factory, shard_id, headless, proxy, contexts, conn):
+    loop = asyncio.get_running_loop()
+    shard = shard_factory(shard_id, headless=headless, proxy=proxy, contexts=contexts)
+    stopped = asyncio.Event()
+    close_call = None
+
+    def reply(call_id, ok, payload):
+        # Every reply carries the browser's crash flag, so the parent sees a
+        # dead browser even while the worker process itself stays up
+        try:
+            conn.send((call_id, ok, payload, shard.crashed))
+        except (OSError, ValueError):
+            # Parent went away, the reader thread will stop the worker
+            pass
+
+    # Call id 0 tells the parent whether the browser came up
+    if not await shard.initialize():
+        reply(0, False, f"Browser shard {shard_id} failed to start")
+        await shard.close()
+        return
+    reply(0, True, True)
+
+    async def handle(call_id, method, args):
+        nonlocal close_call
+        if method == "close":
+            close_call = call_id
+            stopped.set()
+            return
+        try:
+            reply(call_id, True, await getattr(shard, method)(*args))
+        except Exception as e:
+            # Playwright errors don't always survive pickling back to the parent
+            reply(call_id, False, str(e))
+
+    def read_requests():
+        # Each request runs as its own task, so navigations and health
+        # probes proceed concurrently on the worker's loop
+        while True:
+            try:
+                call_id, method, args = conn.recv()
+            except (EOFError, OSError):
+                loop.call_soon_threadsafe(stopped.set)
+                return
+            asyncio.run_coroutine_threadsafe(handle(call_id, method, args), loop)
+            if method == "close":
+                return
+
+    threading.Thread(target=read_requests, daemon=True).start()
+    await stopped.wait()
+    await shard.close()
+    if close_call is not None:
+        reply(close_call, True, None)
+
+
+class ProcessShard:
+    """Browser shard hosted in a dedicated worker process
+
+    shard_factory builds the shard inside the worker and must be picklable,
+    such as a module-level class.
+    """
+
+    def __init__(self, shard_id: int, headless=True, proxy=None, contexts=1, shard_factory=BrowserShard):
+        self.shard_id = shard_id
+        self.headless = headless
+        self.proxy = proxy
+        self.contexts = contexts
+        self.shard_factory = shard_factory
+        self.close_timeout = Config.SHARD_HEALTH_INTERVAL
+        self.process = None
+        self._conn = None
+        self._log_queue = None
+        self._log_thread = None
+        self._loop = None
+        self._pending = {}
+        self._next_call = 0
+        self._failed = False
+        self._closing = False
+
+    @property
+    def crashed(self) -> bool:
+        # No process means nothing would ever answer a call
+        if self._failed or self.process is None:
+            return True
+        return not self.process.is_alive()
+
+    @crashed.setter
+    def crashed(self, value: bool):
+        self._failed = value
+
+    async def initialize(self):
+        """Spawn the worker process and wait for its browser to come up"""
+        self._loop = asyncio.get_running_loop()
+        self._pending[0] = self._loop.create_future()
+        try:
+            context = multiprocessing.get_context("spawn")
+            self._conn, child_conn = context.Pipe()
+            self._log_queue = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    self.shard_factory, self.shard_id, self.headless, self.proxy, self.contexts,
+                    child_conn, self._log_queue, logging.getLogger().getEffectiveLevel()
+                ),
+                daemon=True
+            )
+            process.start()
+            self.process = process
+            child_conn.close()
+            threading.Thread(target=self._read_responses, args=(self._conn,), daemon=True).start()
+            self._log_thread = threading.Thread(target=self._forward_logs, args=(self._log_queue,), daemon=True)
+            self._log_thread.start()
+
+            await asyncio.wait_for(self._pending[0], timeout=Config.SHARD_START_TIMEOUT)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to start worker for shard {self.shard_id}: {str(e)}")
+            if self.process is None:
+                self._release_channels()
+            return False
+
+    def _read_responses(self, conn):
+        while True:
+            try:
+                call_id, ok, payload, shard_crashed = conn.recv()
+            except (EOFError, OSError):
+                break
+            self._notify(self._resolve, call_id, ok, payload, shard_crashed)
+        self._notify(self._fail_pending)
+
+    @staticmethod
+    def _forward_logs(log_queue):
+        while True:
+            try:
+                record = log_queue.get()
+            except (EOFError, OSError, ValueError):
+                return
+            if record is None:
+                return
+            logging.getLogger(record.name).handle(record)
+
+    def _release_channels(self):
+        if self._conn is not None:
+            self._conn.close()
+        if self._log_queue is not None:
+            # Stop the log forwarding thread before closing the queue under it
+            self._log_queue.put(None)
+            if self._log_thread is not None:
+                self._log_thread.join(timeout=1)
+            self._log_queue.close()
+        self._conn = self._log_queue = self._log_thread = None
+
+    def _notify(self, callback, *args):
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Parent loop already closed
+            pass
+
+    def _resolve(self, call_id, ok, payload, shard_crashed):
+        if shard_crashed and not self._closing:
+            self._failed = True
+        future = self._pending.pop(call_id, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _fail_pending(self):
+        if not self._closing:
+            self._failed = True
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError(f"Worker process for shard {self.shard_id} died"))
+
+    async def _call(self, method, *args):
+        if self.crashed:
+            raise RuntimeError(f"Worker process for shard {self.shard_id} is not running")
+        return await self._request(method, *args)
+
+    async def _request(self, method, *args):
+        self._next_call += 1
+        call_id = self._next_call
+        future = self._loop.create_future()
+        self._pending[call_id] = future
+        try:
+            self._conn.send((call_id, method, args))
+        except (OSError, ValueError) as e:
+            self._pending.pop(call_id, None)
+            self._failed = True
+            raise RuntimeError(f"Worker process for shard {self.shard_id} is unreachable: {str(e)}")
+        try:
+            return await future
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def new_page(self) -> Page:
+        raise RuntimeError("Pages cannot be shared across processes, use navigate_and_capture")
+
+    async def navigate_and_capture(self, url: str, token_address: str, element_selector: str = None) -> str:
+        """Navigate and capture inside the worker process"""
+        return await self._call("navigate_and_capture", url, token_address, element_selector)
+
+    async def health(self) -> dict:
+        """Report connection state and memory usage of the worker's browser"""
+        if self.crashed:
+            return {"connected": False, "memory_mb": None}
+        return await self._call("health")
+
+    async def close(self):
+        """Close the worker's browser and stop the process"""
+        if self.process is None:
+            self._release_channels()
+            return
+        self._closing = True
+        try:
+            # A worker whose browser crashed can still shut down cleanly
+            if self.process.is_alive():
+                await asyncio.wait_for(self._request("close"), timeout=self.close_timeout)
+        except Exception as e:
+            logger.error(f"Failed to close shard {self.shard_id} cleanly: {str(e)}")
+        finally:
+            await self._loop.run_in_executor(None, self.process.join, self.close_timeout)
+            if self.process.is_alive():
+                # A hung worker never finishes closing, so make sure it goes away
+                self.process.terminate()
+                await self._loop.run_in_executor(None, self.process.join)
+            self._release_channels()
+            self.process = None
+
+
+class _ShardSlot:
+    """Dispatch bookkeeping for one shard, kept across restarts"""
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.active = 0
+        self.navigations = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.busy_time = 0.0
+        self.memory_mb = None
+        self.draining = False
+        self.draining_since = None
+        self.restarting = False
+        self.checking = False
+        self.started_at = time.monotonic()
+        self._recent = deque()
+
+    def drain(self):
+        """Stop dispatching to this shard until it has been restarted"""
+        if not self.draining:
+            self.draining = True
+            self.draining_since = time.monotonic()
+
+    def record(self, succeeded: bool, elapsed: float):
+        """Count one capture towards this shard's throughput"""
+        self.busy_time += elapsed
+        if succeeded:
+            self.completed += 1
+            self._recent.append(time.monotonic())
+        else:
+            self.failed += 1
+
+    def per_minute(self) -> float:
+        """Captures completed over the last throughput window, scaled to a minute"""
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+        return len(self._recent) * 60 / THROUGHPUT_WINDOW
+
+    @property
+    def available(self) -> bool:
+        return not (self.shard.crashed or self.draining or self.restarting)
+
+    @property
+    def status(self) -> str:
+        if self.restarting:
+            return "restarting"
+        if self.shard.crashed:
+            return "crashed"
+        if self.draining:
+            return "draining"
+        return "healthy"
+
+
+class ShardedBrowserManager:
+    """Runs several browser shards and dispatches work to the least-loaded one"""
+
+    def __init__(self, shards=None, headless=True, proxy=None, use_processes=None):
+        self.config = Config()
+        self.shard_count = max(1, shards or self.config.BROWSER_SHARDS)
+        self.use_processes = self.config.BROWSER_SHARD_PROCESSES if use_processes is None else use_processes
+        self.headless = headless
+        self.proxy = proxy
+        self.slots = []
+        self._pages = {}
+        self._monitor_task = None
+        self._checks = set()
+
+    def _create_shard(self, shard_id: int):
+        shard_cls = ProcessShard if self.use_processes else BrowserShard
+        return shard_cls(
+            shard_id,
+            headless=self.headless,
+            proxy=self.proxy,
+            contexts=self.config.CONTEXTS_PER_SHARD
+        )
+
+    async def initialize(self):
+        """Start all shards and the health monitor"""
+        self.slots = [_ShardSlot(self._create_shard(i)) for i in range(self.shard_count)]
+        results = await asyncio.gather(*(slot.shard.initialize() for slot in self.slots))
+
+        # Failed shards are left to the monitor to restart
+        for slot, started in zip(self.slots, results):
+            if not started:
+                slot.shard.crashed = True
+
+        started = sum(1 for result in results if result)
+        if not started:
+            logger.error("Failed to start any browser shard")
+            await self.close()
+            return False
+
+        self._monitor_task = asyncio.create_task(self._monitor())
+        mode = "worker processes" if self.use_processes else "in-process"
+        logger.info(f"Started {started}/{self.shard_count} browser shards ({mode})")
+        return True
+
+    def _pick_slot(self) -> _ShardSlot:
+        candidates = [slot for slot in self.slots if slot.available]
+        if not candidates:
+            raise RuntimeError("No healthy browser shards available")
+        return min(candidates, key=lambda slot: (slot.active, slot.navigations))
+
+    def _finish_navigation(self, slot: _ShardSlot):
+        slot.active = max(0, slot.active - 1)
+        if slot.navigations >= self.config.SHARD_MAX_NAVIGATIONS:
+            slot.drain()
+
+    async def new_page(self) -> Page:
+        """Create new page on the least-loaded shard (in-process shards only)"""
+        slot = self._pick_slot()
+        page = await slot.shard.new_page()
+        slot.active += 1
+        slot.navigations += 1
+        self._pages[page] = (slot, time.monotonic())
+        page.on("close", lambda _: self._release_page(page))
+        return page
+
+    def _release_page(self, page: Page):
+        entry = self._pages.pop(page, None)
+        if entry:
+            self._finish_navigation(entry[0])
+
+    async def capture_screenshot(self, page: Page, token_address: str, element_selector: str = None) -> str:
+        """Capture screenshot using the shard that owns the page"""
+        entry = self._pages.get(page)
+        if not entry:
+            logger.error(f"Screenshot capture failed for {token_address}: page is not owned by any shard")
+            return None
+        slot, opened_at = entry
+        result = await slot.shard.capture_screenshot(page, token_address, element_selector)
+        slot.record(result is not None, time.monotonic() - opened_at)
+        return result
+
+    async def navigate_and_capture(self, url: str, token_address: str, element_selector: str = None) -> str:
+        """Navigate and capture on the least-loaded shard, retrying once if that shard crashes"""
+        for attempt in range(2):
+            slot = self._pick_slot()
+            shard = slot.shard
+            slot.active += 1
+            slot.navigations += 1
+            started = time.monotonic()
+            try:
+                result = await shard.navigate_and_capture(url, token_address, element_selector)
+                # capture_screenshot reports its own failures as None
+                slot.record(result is not None, time.monotonic() - started)
+                return result
+            except Exception:
+                slot.record(False, time.monotonic() - started)
+                # The monitor may have restarted the slot under this call, in
+                # which case the shard we used is gone even if not flagged
+                if attempt or not (shard.crashed or slot.shard is not shard):
+                    raise
+                logger.warning(f"Shard {shard.shard_id} went down during {url}, retrying on another shard")
+            finally:
+                self._finish_navigation(slot)
+
+    def shard_stats(self) -> list:
+        """Per-shard health and throughput"""
+        now = time.monotonic()
+        stats = []
+        for slot in self.slots:
+            attempts = slot.completed + slot.failed
+            stats.append({
+                "shard_id": slot.shard.shard_id,
+                "status": slot.status,
+                "active": slot.active,
+                "completed": slot.completed,
+                "failed": slot.failed,
+                "restarts": slot.restarts,
+                "memory_mb": slot.memory_mb,
+                "uptime": now - slot.started_at,
+                "avg_latency": slot.busy_time / attempts if attempts else None,
+                "per_minute": slot.per_minute()
+            })
+        return stats
+
+    async def _monitor(self):
+        """Periodically restart crashed, bloated or worn-out shards"""
+        while True:
+            await asyncio.sleep(self.config.SHARD_HEALTH_INTERVAL)
+            for slot in self.slots:
+                # Each shard is checked in its own task, so a slow restart
+                # never holds up checks on the others
+                if slot.checking:
+                    continue
+                task = asyncio.create_task(self._run_check(slot))
+                self._checks.add(task)
+                task.add_done_callback(self._checks.discard)
+
+    async def _run_check(self, slot: _ShardSlot):
+        slot.checking = True
+        try:
+            await self._check_slot(slot)
+        except Exception as e:
+            logger.error(f"Health check failed for shard {slot.shard.shard_id}: {str(e)}")
+        finally:
+            slot.checking = False
+
+    async def _check_slot(self, slot: _ShardSlot):
+        if slot.shard.crashed:
+            logger.warning(f"Restarting crashed browser shard {slot.shard.shard_id}")
+            await self._restart(slot)
+            return
+
+        # Probes run alongside navigations on both shard types, so busy
+        # shards are checked too
+        if not slot.draining:
+            try:
+                status = await asyncio.wait_for(slot.shard.health(), timeout=self.config.SHARD_PROBE_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Shard {slot.shard.shard_id} did not answer health check: {str(e)}")
+                slot.drain()
+            else:
+                slot.memory_mb = status["memory_mb"]
+                if not status["connected"]:
+                    logger.warning(f"Restarting disconnected browser shard {slot.shard.shard_id}")
+                    await self._restart(slot)
+                    return
+                if slot.memory_mb and slot.memory_mb > self.config.SHARD_MAX_MEMORY_MB:
+                    logger.warning(f"Browser shard {slot.shard.shard_id} using {slot.memory_mb:.0f}MB, recycling")
+                    slot.drain()
+
+        # Work dispatched before the shard started draining gets to finish,
+        # unless it outlives the drain timeout and the shard is wedged
+        if slot.draining:
+            drained_for = time.monotonic() - slot.draining_since
+            if not slot.active or drained_for > self.config.SHARD_DRAIN_TIMEOUT:
+                await self._restart(slot)
+
+    async def _restart(self, slot: _ShardSlot):
+        slot.restarting = True
+        try:
+            shard_id = slot.shard.shard_id
+            await slot.shard.close()
+            slot.shard = self._create_shard(shard_id)
+            try:
+                started = await slot.shard.initialize()
+            except Exception as e:
+                logger.error(f"Browser shard {shard_id} raised during restart: {str(e)}")
+                started = False
+            if not started:
+                slot.shard.crashed = True
+                logger.error(f"Failed to restart browser shard {shard_id}")
+            slot.restarts += 1
+            slot.navigations = 0
+            slot.memory_mb = None
+            slot.draining = False
+            slot.draining_since = None
+            slot.started_at = time.monotonic()
+        finally:
+            slot.restarting = False
+
+    async def close(self):
+        """Stop the monitor and clean up all shards"""
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+        for task in list(self._checks):
+            task.cancel()
+        await asyncio.gather(*self._checks, return_exceptions=True)
+        await asyncio.gather(*(slot.shard.close() for slot in self.slots), return_exceptions=True)
+        logger.info("All browser shards closed")